@@ -1,46 +1,119 @@
 import sys
-import json
-import datetime
+import re
+import codecs
+from collections import OrderedDict
 from PyQt5.QtWidgets import ( # type: ignore
     QApplication, QMainWindow, QTextEdit, QAction, QFileDialog,
     QPlainTextEdit, QWidget, QVBoxLayout, QPushButton, QToolBar, QMessageBox
 )
-from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QPainter, QFont # type: ignore
-from PyQt5.QtCore import Qt, QRegExp, QRect, QRectF, QSize # type: ignore
-import subprocess
+from PyQt5.QtGui import QSyntaxHighlighter, QTextCharFormat, QColor, QPainter, QFont, QTextCursor # type: ignore
+from PyQt5.QtCore import QPointF, QRect, QRectF, QSize, QTimer, QProcess, QProcessEnvironment # type: ignore
+
+
+KEYWORDS = ['def', 'class', 'import', 'from', 'as', 'return', 'if', 'elif', 'else',
+            'while', 'for', 'break', 'continue', 'try', 'except', 'finally',
+            'raise', 'with', 'lambda', 'yield']
+
+# One alternation scanned left to right; earlier groups win at the same position.
+# A triple quote only opens a multi-line string where it isn't already inside a
+# comment or string token.
+TOKEN_RE = re.compile(
+    r'(?P<tq>"""|\'\'\')'
+    r'|(?P<com>#[^\n]*)'
+    r'|(?P<str>"[^"\\\n]*(?:\\.[^"\\\n]*)*"|\'[^\'\\\n]*(?:\\.[^\'\\\n]*)*\')'
+    r'|(?P<defn>\b(?:def|class)\s+\w+)'
+    r'|(?P<kw>\b(?:' + '|'.join(KEYWORDS) + r')\b)'
+    r'|(?P<num>\b\d+(?:\.\d*)?\b)'
+)
 
 
 class PythonSyntaxHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.highlighting_rules = []
-
-        self.create_rule(['def', 'class', 'import', 'from', 'as', 'return', 'if', 'elif', 'else', 
-                          'while', 'for', 'break', 'continue', 'try', 'except', 'finally', 
-                          'raise', 'with', 'lambda', 'yield'], QColor("blue"))
-
-        self.create_rule([r'#.*'], QColor("green"))
-
-        self.create_rule([r'"[^"]*"', r"'[^']*'"], QColor("red"))
-
-        self.create_rule([r'\b\d+(\.\d*)?\b'], QColor("orange"))
-
-        self.create_rule([r'\bdef\s+\w+', r'\bclass\s+\w+'], QColor("cyan"))
-
-    def create_rule(self, patterns, color):
-        format = QTextCharFormat()
-        format.setForeground(color)
-        for pattern in patterns:
-            self.highlighting_rules.append((QRegExp(pattern), format))
+        self.formats = {}
+
+        self.token_formats = {
+            'kw': self.get_format(QColor("blue")),
+            'com': self.get_format(QColor("green")),
+            'str': self.get_format(QColor("red")),
+            'num': self.get_format(QColor("orange")),
+            'defn': self.get_format(QColor("cyan")),
+        }
+
+        self.triple_quote_format = self.get_format(QColor("red"))
+        self.triple_quotes = {1: '"""', 2: "'''"}
+
+        self.block_cache = OrderedDict()
+        self.block_cache_size = 512
+
+    def get_format(self, color):
+        # QColor is unhashable, so formats are keyed by its packed rgba value
+        format = self.formats.get(color.rgba())
+        if format is None:
+            format = QTextCharFormat()
+            format.setForeground(color)
+            self.formats[color.rgba()] = format
+        return format
 
     def highlightBlock(self, text):
-        for pattern, format in self.highlighting_rules:
-            expression = QRegExp(pattern)
-            index = expression.indexIn(text)
-            while index >= 0:
-                length = expression.matchedLength()
-                self.setFormat(index, length, format)
-                index = expression.indexIn(text, index + length)
+        key = (text, self.previousBlockState())
+        cached = self.block_cache.get(key)
+        if cached is None:
+            cached = self.scan_block(text, self.previousBlockState())
+            self.block_cache[key] = cached
+            if len(self.block_cache) > self.block_cache_size:
+                self.block_cache.popitem(last=False)
+        else:
+            self.block_cache.move_to_end(key)
+
+        spans, state = cached
+        for start, length, format in spans:
+            self.setFormat(start, length, format)
+        self.setCurrentBlockState(state)
+
+    def scan_block(self, text, previous_state):
+        token_formats = self.token_formats
+        spans = []
+        state = 0
+        pos = 0
+        if previous_state in (1, 2):
+            # Continuing a triple-quoted string from the previous block
+            end = text.find(self.triple_quotes[previous_state])
+            if end < 0:
+                spans.append((0, len(text), self.triple_quote_format))
+                state = previous_state
+                pos = None
+            else:
+                pos = end + 3
+                spans.append((0, pos, self.triple_quote_format))
+
+        while pos is not None:
+            match = TOKEN_RE.search(text, pos)
+            if match is None:
+                break
+            start = match.start()
+            if match.lastgroup == 'tq':
+                delimiter = match.group()
+                end = text.find(delimiter, match.end())
+                if end < 0:
+                    spans.append((start, len(text) - start, self.triple_quote_format))
+                    state = 1 if delimiter == '"""' else 2
+                    break
+                pos = end + 3
+                spans.append((start, pos - start, self.triple_quote_format))
+            else:
+                pos = match.end()
+                spans.append((start, pos - start, token_formats[match.lastgroup]))
+
+        if not text.isascii() and any(ord(char) > 0xFFFF for char in text):
+            # setFormat takes UTF-16 offsets; astral characters take two units
+            offsets = [0]
+            for char in text:
+                offsets.append(offsets[-1] + (2 if ord(char) > 0xFFFF else 1))
+            spans = [(offsets[start], offsets[start + length] - offsets[start], format)
+                     for start, length, format in spans]
+
+        return spans, state
 
 
 class LineNumberArea(QWidget):
@@ -50,21 +123,28 @@ class LineNumberArea(QWidget):
         self.setFixedWidth(40)
 
     def sizeHint(self):
-        return QSize(self.width(), self.editor.fontMetrics().height() * self.editor.blockCount())
+        return QSize(40, 0)
 
     def paintEvent(self, event):
         painter = QPainter(self)
-        painter.fillRect(event.rect(), QColor(40, 40, 40))
-        block = self.editor.firstVisibleBlock()
-        while block.isValid():
-            block_rect = self.editor.blockBoundingGeometry(block).translated(self.editor.contentOffset())
-            if not block_rect.intersects(QRectF(event.rect())):
-                block = block.next()
-                continue
-            block_number = block.blockNumber() + 1
-            painter.setPen(QColor(160, 160, 160))
-            painter.drawText(QRect(0, int(block_rect.top()), self.width(), int(block_rect.height())),
-                             Qt.AlignRight, str(block_number))
+        event_rect = event.rect()
+        event_top = event_rect.top()
+        event_bottom = event_rect.bottom()
+        painter.fillRect(event_rect, QColor(40, 40, 40))
+        painter.setPen(QColor(160, 160, 160))
+        width = self.width()
+        metrics = self.fontMetrics()
+        ascent = metrics.ascent()
+        editor = self.editor
+        block = editor.firstVisibleBlock()
+        # Only the first block needs its geometry; later tops follow from the heights
+        top = editor.blockBoundingGeometry(block).translated(editor.contentOffset()).top()
+        while block.isValid() and top <= event_bottom:
+            height = editor.blockBoundingRect(block).height()
+            if block.isVisible() and top + height >= event_top:
+                number = str(block.blockNumber() + 1)
+                painter.drawText(QPointF(width - metrics.horizontalAdvance(number), int(top) + ascent), number)
+            top += height
             block = block.next()
 
 
@@ -73,19 +153,28 @@ class LineNumberArea(QWidget):
 
 
 class CodeEditor(QPlainTextEdit):
+    SHARED_FONT = None
+
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.highlighter = PythonSyntaxHighlighter(self)
+        self.highlighter = PythonSyntaxHighlighter(self.document())
         self.line_number_area = LineNumberArea(self)
+        self.line_number_update_pending = False
         self.setStyleSheet("background-color: #2e2e2e; color: #dcdcdc;")
         self.set_font_properties()
         self.setLayoutMargins()
         self.blockCountChanged.connect(self.update_line_number_area)
         self.updateRequest.connect(self.handle_update_request) 
 
+    @staticmethod
+    def shared_font():
+        # Built on first use, once a QApplication exists
+        if CodeEditor.SHARED_FONT is None:
+            CodeEditor.SHARED_FONT = QFont('Consolas', 12)
+        return CodeEditor.SHARED_FONT
+
     def set_font_properties(self):
-        font = QFont('Consolas', 12)
-        self.setFont(font)
+        self.setFont(self.shared_font())
 
     def setLayoutMargins(self):
 
@@ -97,27 +186,24 @@ class CodeEditor(QPlainTextEdit):
 
     def handle_update_request(self, rect):
 
-        if isinstance(rect, (QRect, QRectF)):
-            self.update_line_number_area(rect)
-        else:
+        if not isinstance(rect, (QRect, QRectF)):
             print(f"Unexpected type for rect in updateRequest: {type(rect)}")
 
             print(f"Value of rect: {rect}")
+            return
+        if self.line_number_update_pending:
+            return
+        self.line_number_update_pending = True
+        QTimer.singleShot(0, self.flush_line_number_update)
 
-    def update_line_number_area(self, rect=None):
-        if rect is None:
+    def flush_line_number_update(self):
+        self.line_number_update_pending = False
+        self.line_number_area.update()
 
-            cr = self.contentsRect()
-            self.line_number_area.setGeometry(QRect(cr.left(), cr.top(), 40, cr.height()))
-            self.line_number_area.update()
-        else:
-
-            if isinstance(rect, QRect):
-                rect = QRectF(rect) 
-            elif not isinstance(rect, QRectF):
-                pass # xddddddddddddddddddddddddddddddddddddddddddddddddddddddddddd
-                return 
-            self.line_number_area.update(0, int(rect.y()), self.line_number_area.width(), int(rect.height()))
+    def update_line_number_area(self):
+        cr = self.contentsRect()
+        self.line_number_area.setGeometry(QRect(cr.left(), cr.top(), 40, cr.height()))
+        self.line_number_area.update()
 
 
 
@@ -135,8 +221,9 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(self.editor)
         self.create_actions()
         self.create_toolbar()
-
-        self.highlighter = PythonSyntaxHighlighter(self.editor.document())
+        self.proc = None
+        self.last_run_code = None
+        self.last_run_output = None
 
     def create_actions(self):
         self.run_action = QAction('Run', self)
@@ -168,38 +255,110 @@ class MainWindow(QMainWindow):
 
     def run_code(self):
         code = self.editor.toPlainText()
-        try:
-            output = subprocess.check_output(['python', '-c', code], stderr=subprocess.STDOUT, text=True)
-        except subprocess.CalledProcessError as e:
-            output = e.output
+        if not code.strip():
+            return
+
+        # Unchanged code that is still running or whose last run finished cleanly:
+        # bring back its output instead of spawning a new process
+        if code == self.last_run_code and self.last_run_output is not None:
+            running = self.proc.state() != QProcess.NotRunning
+            succeeded = (not running
+                         and self.proc.exitStatus() == QProcess.NormalExit
+                         and self.proc.exitCode() == 0
+                         and self.proc.error() == QProcess.UnknownError)
+            if running or succeeded:
+                self.last_run_output.show()
+                self.last_run_output.raise_()
+                self.last_run_output.activateWindow()
+                return
 
         output_window = QMainWindow(self)
         output_window.setWindowTitle('Output')
         output_widget = QTextEdit()
-        output_widget.setPlainText(output)
         output_widget.setReadOnly(True)
         output_window.setCentralWidget(output_widget)
         output_window.show()
 
+        proc = QProcess(output_window)
+        env = QProcessEnvironment.systemEnvironment()
+        env.insert('PYTHONIOENCODING', 'utf-8')
+        proc.setProcessEnvironment(env)
+        # One decoder per channel so a character split across reads decodes intact
+        stdout_decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        stderr_decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        proc.readyReadStandardOutput.connect(
+            lambda: self.append_output(output_widget, stdout_decoder, proc.readAllStandardOutput()))
+        proc.readyReadStandardError.connect(
+            lambda: self.append_output(output_widget, stderr_decoder, proc.readAllStandardError()))
+        proc.errorOccurred.connect(
+            lambda error: self.append_error(output_widget, proc.errorString()))
+        self.proc = proc
+        proc.start(sys.executable, ['-u', '-c', code])
+        self.last_run_code = code
+        self.last_run_output = output_window
+
+    def append_output(self, output_widget, decoder, data):
+        output_widget.moveCursor(QTextCursor.End)
+        output_widget.insertPlainText(decoder.decode(bytes(data)))
+
+    def append_error(self, output_widget, message):
+        output_widget.moveCursor(QTextCursor.End)
+        output_widget.insertPlainText(f"\n[Process error: {message}]\n")
+
     def save_file(self):
+        import datetime
+
         current_time = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         file_name, _ = QFileDialog.getSaveFileName(self, 'Save File', f'{current_time}.py', 'Python Files (*.py)')
         if file_name:
-            with open(file_name, 'w') as file:
-                file.write(self.editor.toPlainText())
+            with open(file_name, 'wb') as file:
+                file.write(self.editor.toPlainText().encode('utf-8'))
 
     def open_file(self):
         file_name, _ = QFileDialog.getOpenFileName(self, 'Open File', '', 'Python Files (*.py);;Text Files (*.txt)')
         if file_name:
             try:
-                with open(file_name, 'r', encoding='utf-8') as file:
-                    self.editor.setPlainText(file.read())
-            except UnicodeDecodeError:
+                self.load_file(file_name)
+            except Exception as e:
+                print(f"Error opening file: {e}")
+
+    def load_file(self, file_name):
+        document = self.editor.document()
+        highlighter = self.editor.highlighter
+        self.editor.setUpdatesEnabled(False)
+        highlighter.setDocument(None)
+        document.setUndoRedoEnabled(False)
+        try:
+            with open(file_name, 'rb') as file:
                 try:
-                    with open(file_name, 'r', encoding='latin-1') as file:
-                        self.editor.setPlainText(file.read())
-                except Exception as e:
-                    print(f"Error opening file: {e}")
+                    self.insert_decoded(file, 'utf-8')
+                except UnicodeDecodeError:
+                    # Not utf-8: start over from the top; only this fallback reads the file twice
+                    file.seek(0)
+                    self.insert_decoded(file, 'latin-1')
+        finally:
+            document.setUndoRedoEnabled(True)
+            highlighter.setDocument(document)
+            self.editor.setUpdatesEnabled(True)
+        self.editor.moveCursor(QTextCursor.Start)
+
+    def insert_decoded(self, file, encoding, chunk_size=1024 * 1024):
+        self.editor.clear()
+        cursor = QTextCursor(self.editor.document())
+        decoder = codecs.getincrementaldecoder(encoding)()
+        pending = ''
+        while True:
+            data = file.read(chunk_size)
+            text = pending + decoder.decode(data, final=not data)
+            # Hold back a trailing \r so a \r\n split across reads stays one line break
+            if data and text.endswith('\r'):
+                text, pending = text[:-1], '\r'
+            else:
+                pending = ''
+            if text:
+                cursor.insertText(text)
+            if not data:
+                break
 
     def show_credits(self):
         QMessageBox.information(self, 'About', 'CoolCode Editor\n\nVersion 1.0\nCreated by Sabisa324\n\nsory if something no wok im jus tryin me best\nhttps://discord.gg/ATUM87pqKG')